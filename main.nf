@@ -17,13 +17,29 @@ params.subfolder = 'csvs'
 params.token = System.getenv('DX_TOKEN') ?: null
 params.slack_channel = 'egg-test'
 params.testing = true
+// Directory for the per-run structured results file (JSON lines) written by
+// the parser. Leave as null to derive the summary from the pass/fail logs.
+// Setting this requires a variant_workbook_parser version that accepts
+// --run_results_file, otherwise the parser rejects the argument and fails.
+params.run_results_dir = null
+// Run ID shared by every stage, unique to each execution (including
+// -resume, which reuses the Nextflow session ID). Each stage writes timed
+// spans to <trace_dir>/<run_id>.jsonl, with the Nextflow session ID and run
+// name recorded on the parse_workbooks span.
+params.run_id = UUID.randomUUID().toString()
+params.trace_dir = '/tmp/auto_clinvar_traces'
 
 process parse_workbooks {
     beforeScript 'echo "Starting the workflow"'
     // afterScript "bash /home/report_success.sh ${params.slack_channel} 'message' 'success'"
 
     script:
-    def cmd = "/pyenv/shims/python3 /variant_workbook_parser/variant_workbook_parser.py"
+    def trace_file = "${params.trace_dir}/${params.run_id}.jsonl"
+    def cmd = "/pyenv/shims/python3 /home/utils/tracing.py run --name parse_workbooks"
+    cmd += " --run-id ${params.run_id} --trace-file ${trace_file}"
+    cmd += " --attribute nextflow.session_id=${workflow.sessionId}"
+    cmd += " --attribute nextflow.run_name=${workflow.runName} --"
+    cmd += " /pyenv/shims/python3 /variant_workbook_parser/variant_workbook_parser.py"
     cmd += " --indir ${params.indir}"
     cmd += " --outdir ${params.outdir}"
     cmd += " --parsed_file_log ${params.parsed_file_log}"
@@ -31,6 +47,12 @@ process parse_workbooks {
     cmd += " --failed_file_log ${params.failed_file_log}"
     cmd += " --completed_dir ${params.completed_dir}"
     cmd += " --failed_dir ${params.failed_dir}"
+    def notify_opts = " --run-id ${params.run_id} --trace-file ${trace_file}"
+    if (params.run_results_dir) {
+        def run_results_file = "${params.run_results_dir}/${params.run_id}_results.jsonl"
+        cmd += " --run_results_file ${run_results_file}"
+        notify_opts += " --run-results-path ${run_results_file}"
+    }
     if (params.testing == true) {
         // This "if block" is conditional on the success of the script (cmd).
         // Otherwise the else raises a failure message.
@@ -40,12 +62,12 @@ process parse_workbooks {
             echo "Success"
             /pyenv/shims/python3 /home/utils/slack_notifications.py -c 'egg-test' \
              -o "success" --fail-log-path ${params.failed_file_log} \
-             --pass-log-path ${params.parsed_file_log} -T
+             --pass-log-path ${params.parsed_file_log}${notify_opts} -T
         else
             echo "Failure"
             /pyenv/shims/python3 /home/utils/slack_notifications.py -c 'egg-test' \
              -o "fail" --fail-log-path ${params.failed_file_log} \
-             --pass-log-path ${params.parsed_file_log} -T
+             --pass-log-path ${params.parsed_file_log}${notify_opts} -T
         fi
         """
     }
@@ -58,12 +80,12 @@ process parse_workbooks {
             echo "Success"
             /pyenv/shims/python3 /home/utils/slack_notifications.py -c ${params.slack_channel} \
              -o "success" --fail-log-path ${params.failed_file_log} \
-             --pass-log-path ${params.parsed_file_log}
+             --pass-log-path ${params.parsed_file_log}${notify_opts}
         else
             echo "Failure"
             /pyenv/shims/python3 /home/utils/slack_notifications.py -c ${params.slack_channel} \
              -o "fail" --fail-log-path ${params.failed_file_log} \
-             --pass-log-path ${params.parsed_file_log}
+             --pass-log-path ${params.parsed_file_log}${notify_opts}
         fi
         """
     } else if (params.token) {
@@ -73,12 +95,12 @@ process parse_workbooks {
             echo "Success"
             /pyenv/shims/python3 /home/utils/slack_notifications.py -c ${params.slack_channel} \
              -o "success" --fail-log-path ${params.failed_file_log} \
-             --pass-log-path ${params.parsed_file_log}
+             --pass-log-path ${params.parsed_file_log}${notify_opts}
         else
             echo "Failure"
             /pyenv/shims/python3 /home/utils/slack_notifications.py -c ${params.slack_channel} \
              -o "fail" --fail-log-path ${params.failed_file_log} \
-             --pass-log-path ${params.parsed_file_log}
+             --pass-log-path ${params.parsed_file_log}${notify_opts}
         fi
         """
     } else {
@@ -88,12 +110,12 @@ process parse_workbooks {
             echo "Success"
             /pyenv/shims/python3 /home/utils/slack_notifications.py -c ${params.slack_channel} \
              -o "success" --fail-log-path ${params.failed_file_log} \
-             --pass-log-path ${params.parsed_file_log}
+             --pass-log-path ${params.parsed_file_log}${notify_opts}
         else
             echo "Failure"
             /pyenv/shims/python3 /home/utils/slack_notifications.py -c ${params.slack_channel} \
              -o "fail" --fail-log-path ${params.failed_file_log} \
-             --pass-log-path ${params.parsed_file_log}
+             --pass-log-path ${params.parsed_file_log}${notify_opts}
         fi
         """
     }
@@ -101,6 +123,7 @@ process parse_workbooks {
 }
 
 workflow {
+    log.info "Run ID: ${params.run_id}"
     parse_workbooks()
 }
 
@@ -116,4 +139,7 @@ workflow.onComplete {
     else {
         println "Workflow completed successfully"
     }
+    def trace_file = "${params.trace_dir}/${params.run_id}.jsonl"
+    println "Run ${params.run_id} spans written to ${trace_file}"
+    println "Report with: python3 /home/utils/tracing.py report --trace-file ${trace_file}"
 }
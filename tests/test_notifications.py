@@ -8,6 +8,7 @@ import os
 import json
 import sys
 import argparse
+import tempfile
 
 from unittest.mock import patch, Mock
 import logging
@@ -15,8 +16,11 @@ sys.path.append('utils/')
 
 from slack_notifications import (
     parse_args, read_log_file, filter_by_today, count_metrics,
-    collate_wb_info, slack_notify_webhook, coordinate_notifications
+    collate_wb_info, slack_notify_webhook, coordinate_notifications,
+    read_run_results, count_run_results, collate_run_results
 )
+from tracing import Tracer
+from urllib3.util import Retry
 
 # Mock logging
 log = logging.getLogger('slack_notifications')
@@ -183,6 +187,111 @@ class TestMetrics(unittest.TestCase):
         self.assertEqual(total_failed, 2)
 
 
+class TestRunResults(unittest.TestCase):
+    """
+    Test cases for deriving metrics from the structured run results file.
+    """
+    RUN_RESULTS = (
+        '{"run_id": "run1", "workbook": "wb1.xlsx", "workbook_hash": "a1", '
+        '"status": "fail", "timings": {"parse": 1.2}}\n'
+        '{"run_id": "run1", "workbook": "wb2.xlsx", "workbook_hash": "b2", '
+        '"status": "pass", "timings": {"parse": 0.8}}\n'
+        '\n'
+        '{"run_id": "run1", "workbook": "wb1.xlsx", "workbook_hash": "a1", '
+        '"status": "pass", "timings": {"parse": 1.1}}\n'
+    )
+
+    def test_read_run_results_deduplicates_by_hash(self):
+        """
+        test_read_run_results_deduplicates_by_hash
+        Test a retried workbook is only counted once, keeping its last status.
+        """
+        with patch('builtins.open', new_callable=mock_open,
+                   read_data=self.RUN_RESULTS):
+            results = read_run_results('dummy_path')
+        self.assertEqual(sorted(results), ['a1', 'b2'])
+        self.assertEqual(results['a1']['status'], 'pass')
+
+    def test_read_run_results_skips_malformed_lines(self):
+        """
+        test_read_run_results_skips_malformed_lines
+        Test malformed lines are skipped rather than raising.
+        """
+        read_data = (
+            'not json\n'
+            '{"workbook": "wb1.xlsx", "workbook_hash": "a1", "status": "fail"}\n'
+        )
+        with patch('builtins.open', new_callable=mock_open,
+                   read_data=read_data):
+            results = read_run_results('dummy_path')
+        self.assertEqual(list(results), ['a1'])
+
+    def test_read_run_results_skips_records_without_hash(self):
+        """
+        test_read_run_results_skips_records_without_hash
+        Test records with no workbook hash are skipped, not merged.
+        """
+        read_data = (
+            '{"status": "fail"}\n{"status": "pass"}\n'
+            '{"workbook": "wb1.xlsx", "workbook_hash": "a1", '
+            '"status": "pass"}\n'
+        )
+        with patch('builtins.open', new_callable=mock_open,
+                   read_data=read_data), \
+                patch('slack_notifications.log') as mock_log:
+            results = read_run_results('dummy_path')
+        self.assertEqual(list(results), ['a1'])
+        self.assertEqual(mock_log.warning.call_count, 2)
+
+    def test_read_run_results_mixed_keys(self):
+        """
+        test_read_run_results_mixed_keys
+        Test a retry missing its hash is not counted as a second workbook.
+        """
+        read_data = (
+            '{"workbook": "wb1.xlsx", "workbook_hash": "a1", '
+            '"status": "fail"}\n'
+            '{"workbook": "wb1.xlsx", "status": "pass"}\n'
+        )
+        with patch('builtins.open', new_callable=mock_open,
+                   read_data=read_data), \
+                patch('slack_notifications.log') as mock_log:
+            results = read_run_results('dummy_path')
+        self.assertEqual(count_run_results(results), (1, 0, 1))
+        mock_log.warning.assert_called_once()
+
+    def test_count_run_results_unknown_status(self):
+        """
+        test_count_run_results_unknown_status
+        Test unknown statuses are logged and counted as failed.
+        """
+        run_results = {'a1': {'status': 'passed'}, 'b2': {'status': 'FAIL'}}
+        with patch('slack_notifications.log') as mock_log:
+            self.assertEqual(count_run_results(run_results), (2, 0, 2))
+        self.assertEqual(mock_log.warning.call_count, 2)
+
+    def test_count_run_results(self):
+        """
+        test_count_run_results
+        Test if count_run_results returns correct metrics.
+        """
+        run_results = {
+            'a1': {'status': 'pass'},
+            'b2': {'status': 'fail'},
+            'c3': {'status': 'pass'},
+        }
+        self.assertEqual(count_run_results(run_results), (3, 2, 1))
+
+    def test_collate_run_results(self):
+        """
+        test_collate_run_results
+        Test if collate_run_results returns correct metrics from file.
+        """
+        with patch('builtins.open', new_callable=mock_open,
+                   read_data=self.RUN_RESULTS):
+            self.assertEqual(collate_run_results('dummy_path'), (2, 2, 0))
+
+
 class TestSlackNotifyWebhook(unittest.TestCase):
     """
     Test cases for sending slack notifications.
@@ -335,6 +444,35 @@ class TestSlackNotifyWebhook(unittest.TestCase):
             mock_log.error.assert_called_with(
                 f"Error in sending slack notification: {mock_post.return_value.text}")
 
+    @patch('slack_notifications.Session.post')
+    def test_slack_notify_webhook_records_retries(self, mock_post):
+        """
+        test_slack_notify_webhook_records_retries
+        Test the webhook span records the number of retries used.
+
+        Parameters
+        ----------
+        mock_post : unittest.mock.MagicMock
+            Mock POST request
+        """
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.raw.retries = Retry(total=3, history=('a', 'b'))
+        mock_post.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            trace_file = os.path.join(tmpdir, 'trace.jsonl')
+            with patch('slack_notifications.tracer',
+                       Tracer('run1', trace_file)):
+                slack_notify_webhook('Test message', 'success', WEBHOOK_URL)
+            with open(trace_file) as file:
+                span = json.loads(file.readline())
+
+        self.assertEqual(span['name'], 'slack_webhook_post')
+        self.assertIn(
+            {'key': 'http.retry_count', 'value': {'stringValue': '2'}},
+            span['attributes'])
+
     @patch('slack_notifications.Session.post')
     def test_slack_notify_webhook_logging_invalid_outcome(self, mock_post):
         """
@@ -388,6 +526,96 @@ class TestCoordinateNotifications(unittest.TestCase):
         coordinate_notifications(parsed_args, 'success')
         mock_slack_notify_webhook.assert_called_once()
 
+    @patch('slack_notifications.os.path.exists', return_value=True)
+    @patch('slack_notifications.collate_wb_info')
+    @patch('slack_notifications.collate_run_results')
+    @patch('slack_notifications.slack_notify_webhook')
+    def test_coordinate_notifications_run_results(self,
+                                                  mock_slack_notify_webhook,
+                                                  mock_collate_run_results,
+                                                  mock_collate_wb_info,
+                                                  mock_exists):
+        """
+        test_coordinate_notifications_run_results
+        Test if coordinate_notifications uses the run results file when given.
+
+        Parameters
+        ----------
+        mock_slack_notify_webhook : unittest.mock.MagicMock
+            Mock slack_notify_webhook function
+        mock_collate_run_results : unittest.mock.MagicMock
+            Mock collate_run_results function
+        mock_collate_wb_info : unittest.mock.MagicMock
+            Mock collate_wb_info function
+        mock_exists : unittest.mock.MagicMock
+            Mock os.path.exists function
+        """
+        mock_collate_run_results.return_value = (3, 3, 0)
+        parsed_args = argparse.Namespace(
+            channel='egg-test', outcome='success',
+            fail_log_path='fail_log.txt', pass_log_path='pass_log.txt',
+            run_results_path='run_results.jsonl', testing=False
+        )
+        coordinate_notifications(parsed_args, 'success')
+        mock_collate_run_results.assert_called_once_with('run_results.jsonl')
+        mock_collate_wb_info.assert_not_called()
+        mock_slack_notify_webhook.assert_called_once()
+
+    @patch('slack_notifications.collate_wb_info')
+    @patch('slack_notifications.slack_notify_webhook')
+    def test_coordinate_notifications_missing_run_results(
+            self, mock_slack_notify_webhook, mock_collate_wb_info):
+        """
+        test_coordinate_notifications_missing_run_results
+        Test a missing run results file falls back to the logs with a
+        warning and a note in the message.
+
+        Parameters
+        ----------
+        mock_slack_notify_webhook : unittest.mock.MagicMock
+            Mock slack_notify_webhook function
+        mock_collate_wb_info : unittest.mock.MagicMock
+            Mock collate_wb_info function
+        """
+        mock_collate_wb_info.return_value = (3, 3, 0)
+        parsed_args = argparse.Namespace(
+            channel='egg-test', outcome='success',
+            fail_log_path='fail_log.txt', pass_log_path='pass_log.txt',
+            run_results_path='/nonexistent/run_results.jsonl', testing=False
+        )
+        with patch('slack_notifications.log') as mock_log:
+            coordinate_notifications(parsed_args, 'success')
+        mock_log.warning.assert_called_once()
+        mock_collate_wb_info.assert_called_once_with(
+            'fail_log.txt', 'pass_log.txt')
+        message = mock_slack_notify_webhook.call_args[0][0]
+        self.assertIn("Run results file not found", message)
+
+    @patch('slack_notifications.collate_wb_info')
+    @patch('slack_notifications.slack_notify_webhook')
+    def test_coordinate_notifications_invalid_state(
+            self, mock_slack_notify_webhook, mock_collate_wb_info):
+        """
+        test_coordinate_notifications_invalid_state
+        Test inconsistent counts send a single fail notification.
+
+        Parameters
+        ----------
+        mock_slack_notify_webhook : unittest.mock.MagicMock
+            Mock slack_notify_webhook function
+        mock_collate_wb_info : unittest.mock.MagicMock
+            Mock collate_wb_info function
+        """
+        mock_collate_wb_info.return_value = (3, 2, 0)
+        parsed_args = argparse.Namespace(
+            channel='egg-test', outcome='success',
+            fail_log_path='fail_log.txt', pass_log_path='pass_log.txt',
+            testing=False
+        )
+        coordinate_notifications(parsed_args, 'success')
+        mock_slack_notify_webhook.assert_called_once()
+        self.assertEqual(mock_slack_notify_webhook.call_args[0][1], 'fail')
+
 
 if __name__ == '__main__':
     unittest.main()
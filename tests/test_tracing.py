@@ -0,0 +1,261 @@
+"""
+Test cases for tracing.py
+"""
+import unittest
+import argparse
+import json
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+sys.path.append('utils/')
+
+from tracing import (
+    Tracer, trace_id_from_run_id, read_spans, critical_path, format_report,
+    run_command, main
+)
+
+
+def make_span(name, span_id, start, end, parent_span_id='', trace_id='t1'):
+    """
+    Build a span dict in the format written to the trace file.
+    """
+    return {
+        'traceId': trace_id, 'spanId': span_id,
+        'parentSpanId': parent_span_id, 'name': name,
+        'startTimeUnixNano': start, 'endTimeUnixNano': end,
+        'attributes': [{'key': 'run.id', 'value': {'stringValue': 'run1'}}],
+        'status': {'code': 'STATUS_CODE_OK'},
+    }
+
+
+class TestTracer(unittest.TestCase):
+    """
+    Test cases for recording spans.
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.trace_file = os.path.join(self.tmpdir.name, 'trace.jsonl')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def unwritable_trace_file(self):
+        """
+        Path whose parent is a regular file, so it can never be created.
+        """
+        blocker = os.path.join(self.tmpdir.name, 'blocker')
+        open(blocker, 'w').close()
+        return os.path.join(blocker, 'dir', 'trace.jsonl')
+
+    def read_trace(self):
+        with open(self.trace_file) as file:
+            return [json.loads(line) for line in file]
+
+    def test_trace_id_from_run_id(self):
+        """
+        test_trace_id_from_run_id
+        Test trace ids are 32 hex characters and stable for a run id.
+        """
+        run_uuid = '12345678-1234-5678-1234-567812345678'
+        self.assertEqual(
+            trace_id_from_run_id(run_uuid), run_uuid.replace('-', ''))
+        self.assertEqual(len(trace_id_from_run_id('run1')), 32)
+        self.assertEqual(
+            trace_id_from_run_id('run1'), trace_id_from_run_id('run1'))
+
+    def test_span_nesting(self):
+        """
+        test_span_nesting
+        Test nested spans are parented to the enclosing span.
+        """
+        tracer = Tracer('run1', self.trace_file, 'test', 'a' * 16)
+        with tracer.span('outer'):
+            with tracer.span('inner') as attributes:
+                attributes['count'] = 3
+        inner, outer = self.read_trace()
+        self.assertEqual(outer['parentSpanId'], 'a' * 16)
+        self.assertEqual(inner['parentSpanId'], outer['spanId'])
+        self.assertEqual(inner['traceId'], outer['traceId'])
+        self.assertIn(
+            {'key': 'count', 'value': {'stringValue': '3'}},
+            inner['attributes'])
+
+    def test_span_error(self):
+        """
+        test_span_error
+        Test a span records an error status when its block raises.
+        """
+        tracer = Tracer('run1', self.trace_file)
+        with self.assertRaises(ValueError):
+            with tracer.span('failing'):
+                raise ValueError('error')
+        span, = self.read_trace()
+        self.assertEqual(span['status']['code'], 'STATUS_CODE_ERROR')
+
+    def test_disabled_tracer(self):
+        """
+        test_disabled_tracer
+        Test no trace file is written without a run id.
+        """
+        tracer = Tracer(None, self.trace_file)
+        with tracer.span('span'):
+            pass
+        self.assertFalse(os.path.exists(self.trace_file))
+
+    def test_unwritable_trace_file(self):
+        """
+        test_unwritable_trace_file
+        Test a span that cannot be written is logged and does not raise.
+        """
+        tracer = Tracer('run1', self.unwritable_trace_file())
+        with self.assertLogs('tracing', level='WARNING'):
+            with tracer.span('span'):
+                pass
+
+    def test_run_command_unwritable_trace_file(self):
+        """
+        test_run_command_unwritable_trace_file
+        Test the wrapper returns the child's exit code when the trace file
+        cannot be written.
+        """
+        for command, expected in (('true', 0), ('false', 1)):
+            args = argparse.Namespace(
+                name='parse_workbooks', run_id='run1',
+                trace_file=self.unwritable_trace_file(), attribute=[],
+                command=[command]
+            )
+            with self.assertLogs('tracing', level='WARNING'):
+                self.assertEqual(run_command(args), expected)
+
+    def test_read_spans_skips_malformed_lines(self):
+        """
+        test_read_spans_skips_malformed_lines
+        Test a truncated line is skipped rather than failing the report.
+        """
+        tracer = Tracer('run1', self.trace_file)
+        tracer.record_span('complete', 0, 10)
+        with open(self.trace_file, 'a') as file:
+            file.write('{"traceId": "trunc')
+        with self.assertLogs('tracing', level='WARNING'):
+            spans = read_spans(self.trace_file)
+        self.assertEqual([s['name'] for s in spans], ['complete'])
+
+    def test_read_spans_skips_non_span_records(self):
+        """
+        test_read_spans_skips_non_span_records
+        Test valid JSON lines that are not spans are skipped.
+        """
+        tracer = Tracer('run1', self.trace_file)
+        tracer.record_span('complete', 0, 10)
+        with open(self.trace_file, 'a') as file:
+            file.write('{"a": 1}\n[1, 2]\n')
+        with self.assertLogs('tracing', level='WARNING') as logs:
+            spans = read_spans(self.trace_file)
+        self.assertEqual(len(logs.output), 2)
+        self.assertEqual([s['name'] for s in spans], ['complete'])
+
+    def test_report_missing_trace_file(self):
+        """
+        test_report_missing_trace_file
+        Test the report command exits non-zero with an error message when
+        the trace file does not exist.
+        """
+        test_args = [
+            'tracing.py', 'report', '--trace-file',
+            os.path.join(self.tmpdir.name, 'missing.jsonl')
+        ]
+        with patch('sys.argv', test_args), \
+                patch('sys.stderr') as mock_stderr:
+            with self.assertRaises(SystemExit) as context:
+                main()
+        self.assertEqual(context.exception.code, 1)
+        mock_stderr.write.assert_called()
+
+    def test_run_command_records_attributes(self):
+        """
+        test_run_command_records_attributes
+        Test the run wrapper creates the trace directory and records
+        attributes given on the command line.
+        """
+        trace_file = os.path.join(self.tmpdir.name, 'traces', 'run1.jsonl')
+        args = argparse.Namespace(
+            name='parse_workbooks', run_id='run1', trace_file=trace_file,
+            attribute=['nextflow.session_id=abc'], command=['true']
+        )
+        self.assertEqual(run_command(args), 0)
+        span, = read_spans(trace_file)
+        self.assertIn(
+            {'key': 'nextflow.session_id', 'value': {'stringValue': 'abc'}},
+            span['attributes'])
+
+    def test_read_spans_latest_run(self):
+        """
+        test_read_spans_latest_run
+        Test read_spans defaults to the most recently started run.
+        """
+        tracer = Tracer('run1', self.trace_file)
+        tracer.record_span('first', 0, 10)
+        tracer.configure('run2', self.trace_file)
+        tracer.record_span('second', 20, 30)
+        self.assertEqual(
+            [s['name'] for s in read_spans(self.trace_file)], ['second'])
+        self.assertEqual(
+            [s['name'] for s in read_spans(self.trace_file, 'run1')],
+            ['first'])
+
+
+class TestCriticalPath(unittest.TestCase):
+    """
+    Test cases for the critical-path report.
+    """
+    def test_critical_path(self):
+        """
+        test_critical_path
+        Test the critical path follows the spans that finish last and
+        computes self time excluding children on the path.
+        """
+        spans = [
+            make_span('parse_workbooks', 'p', 0, 100),
+            make_span('read_workbook', 'r', 0, 30, 'p'),
+            make_span('dx_upload', 'd', 30, 90, 'p'),
+            make_span('overlapping', 'o', 10, 80, 'p'),
+            make_span('slack_notifications', 's', 100, 150),
+            make_span('slack_webhook_post', 'w', 110, 150, 's'),
+        ]
+        rows = [(depth, span['name'], self_ns)
+                for depth, span, self_ns in critical_path(spans)]
+        self.assertEqual(rows, [
+            (0, 'parse_workbooks', 10),
+            (1, 'read_workbook', 30),
+            (1, 'dx_upload', 60),
+            (0, 'slack_notifications', 10),
+            (1, 'slack_webhook_post', 40),
+        ])
+
+    def test_format_report(self):
+        """
+        test_format_report
+        Test the report lists each span on the critical path.
+        """
+        spans = [
+            make_span('parse_workbooks', 'p', 0, 1_000_000_000),
+            make_span('slack_notifications', 's',
+                      1_000_000_000, 2_000_000_000),
+        ]
+        report = format_report(spans)
+        self.assertIn('Run run1: 2.00s wall time', report)
+        self.assertIn('parse_workbooks', report)
+        self.assertIn('50.0%', report)
+
+    def test_format_report_empty(self):
+        """
+        test_format_report_empty
+        Test an empty trace gives a message rather than raising.
+        """
+        self.assertEqual(format_report([]), 'No spans found')
+
+
+if __name__ == '__main__':
+    unittest.main()
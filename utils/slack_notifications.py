@@ -12,6 +12,8 @@ from urllib3.util import Retry
 import argparse
 import json
 
+from tracing import Tracer
+
 logging.basicConfig(
     filename="/tmp/auto_clinvar_slack_notify.log",
     encoding="utf-8",
@@ -22,6 +24,7 @@ logging.basicConfig(
     level=logging.INFO
 )
 log = logging.getLogger("monitor log")
+tracer = Tracer(service_name="slack_notifications")
 
 
 def parse_args():
@@ -51,6 +54,23 @@ def parse_args():
         '--pass-log-path', help="path to pass log file", type=str,
         required=True
     )
+    parser.add_argument(
+        '--run-results-path', help=(
+            "path to JSON lines file of per-workbook results written by the "
+            "parser for this run. If given, the summary is derived from this "
+            "file instead of the pass and fail logs. Each record needs a "
+            "workbook_hash, used to deduplicate retries, and a status of "
+            "exactly 'pass' or 'fail'; any other status counts as failed"
+        ), type=str, required=False, default=None
+    )
+    parser.add_argument(
+        '--run-id', help="run id generated in main.nf, used for tracing",
+        type=str, required=False, default=None
+    )
+    parser.add_argument(
+        '--trace-file', help="path to trace file to write spans to",
+        type=str, required=False, default=None
+    )
 
     return parser.parse_args()
 
@@ -156,6 +176,109 @@ def collate_wb_info(fail_log_path: str = 'workbooks_fail_to_parse.txt',
     return total_parsed, total_passed, total_failed
 
 
+def read_run_results(file_path):
+    """
+    Read the per-run structured results file written by the parser.
+
+    Each line is a JSON object with the keys run_id, workbook,
+    workbook_hash, status and timings. Records are deduplicated by
+    workbook hash so a workbook retried within the same run is only
+    counted once, with its last status kept. Records without a workbook
+    hash are skipped, as they cannot be matched against a retry.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the JSON lines results file.
+
+    Returns
+    -------
+    dict
+        Latest result record for each unique workbook, keyed by hash.
+    """
+    results = {}
+    with open(file_path, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                log.warning(f"Skipping malformed run result line: {line}")
+                continue
+            if not isinstance(record, dict) or not record.get('workbook_hash'):
+                log.warning(
+                    f"Skipping run result with no workbook hash: {line}"
+                )
+                continue
+            results[record['workbook_hash']] = record
+    return results
+
+
+def count_run_results(run_results):
+    """
+    Count the total number of workbooks parsed, passed, and failed
+    from deduplicated run results. Any status other than 'pass' or
+    'fail' is logged and counted as failed so it is not reported as a
+    clean success.
+
+    Parameters
+    ----------
+    run_results : dict
+        Result records keyed by workbook hash, as returned by
+        read_run_results.
+
+    Returns
+    -------
+    total_wb_parsed : int
+        The total number of workbooks parsed.
+    total_wb_passed : int
+        The total number of workbooks that passed.
+    total_wb_failed : int
+        The total number of workbooks that failed.
+    """
+    total_wb_passed = 0
+    total_wb_failed = 0
+    for key, record in run_results.items():
+        status = record.get('status')
+        if status == 'pass':
+            total_wb_passed += 1
+        else:
+            if status != 'fail':
+                log.warning(
+                    f"Unknown status {status} for workbook {key}, "
+                    "counting as failed"
+                )
+            total_wb_failed += 1
+    total_wb_parsed = total_wb_passed + total_wb_failed
+    return total_wb_parsed, total_wb_passed, total_wb_failed
+
+
+def collate_run_results(run_results_path):
+    """
+    Collates workbook information for this run from the structured
+    results file and returns the total parsed, total passed, and total
+    failed metrics.
+
+    Parameters
+    ----------
+    run_results_path : str
+        The file path to the JSON lines results file for this run.
+
+    Returns
+    -------
+    total_parsed : int
+        The total number of workbooks parsed.
+    total_passed : int
+        The total number of workbooks that passed.
+    total_failed : int
+        The total number of workbooks that failed.
+    """
+    run_results = read_run_results(run_results_path)
+    return count_run_results(run_results)
+
+
 def slack_notify_webhook(message, outcome, webhook_url) -> None:
     """
     Send notification to given Slack channel using a webhook
@@ -187,9 +310,14 @@ def slack_notify_webhook(message, outcome, webhook_url) -> None:
         http = Session()
         retries = Retry(total=5, backoff_factor=5, allowed_methods=['POST'])
         http.mount("https://", HTTPAdapter(max_retries=retries))
-        response = http.post(webhook_url,
-                             data=json.dumps(payload),
-                             headers={'Content-Type': 'application/json'})
+        with tracer.span('slack_webhook_post') as attributes:
+            response = http.post(webhook_url,
+                                 data=json.dumps(payload),
+                                 headers={'Content-Type': 'application/json'})
+            attributes['http.status_code'] = response.status_code
+            retry_state = getattr(response.raw, 'retries', None)
+            if isinstance(retry_state, Retry):
+                attributes['http.retry_count'] = len(retry_state.history)
         response.raise_for_status()  # Raise an exception for HTTP errors
         if response.status_code != 200:
             log.error(f"Error in sending slack notification: {response.text}")
@@ -234,9 +362,26 @@ def coordinate_notifications(parsed_args, outcome):
         raise ValueError("Invalid channel provided for slack notification")
     # Logic to handle different messages
     if outcome == 'success':
-        total_parsed, total_passed, total_failed = collate_wb_info(
-            parsed_args.fail_log_path, parsed_args.pass_log_path
-        )
+        run_results_path = getattr(parsed_args, 'run_results_path', None)
+        count_note = ""
+        with tracer.span('collate_summary'):
+            if run_results_path and os.path.exists(run_results_path):
+                total_parsed, total_passed, total_failed = (
+                    collate_run_results(run_results_path)
+                )
+            else:
+                if run_results_path:
+                    log.warning(
+                        f"Run results file {run_results_path} not found, "
+                        "falling back to counting today's pass/fail log lines"
+                    )
+                    count_note = (
+                        "Run results file not found, counts are taken from "
+                        "today's pass/fail logs and may include earlier runs.\n"
+                    )
+                total_parsed, total_passed, total_failed = collate_wb_info(
+                    parsed_args.fail_log_path, parsed_args.pass_log_path
+                )
         if total_failed > 0:
             message = (
                 f"{script_name}\n"
@@ -244,6 +389,7 @@ def coordinate_notifications(parsed_args, outcome):
                 f":black_small_square: {total_parsed} workbooks parsed\n"
                 f":black_small_square: {total_passed} passed\n"
                 f":black_small_square: {total_failed} failed\n"
+                f"{count_note}"
             )
             slack_notify_webhook(message, 'fail', SLACK_WEBHOOK_URL)
         elif total_parsed == total_passed:
@@ -254,11 +400,21 @@ def coordinate_notifications(parsed_args, outcome):
                 f":black_small_square: {total_passed} passed\n"
                 f":black_small_square: {total_failed} failed\n"
                 "These workbooks require manual intervention.\n"
+                f"{count_note}"
             )
             slack_notify_webhook(message, 'success', SLACK_WEBHOOK_URL)
         else:
             log.error("Invalid state to send slack notification")
-            slack_notify_webhook(message, 'success', SLACK_WEBHOOK_URL)
+            message = (
+                f"{script_name}\n"
+                f"Automated parsing ran but workbook counts are inconsistent.\n"
+                f":black_small_square: {total_parsed} workbooks parsed\n"
+                f":black_small_square: {total_passed} passed\n"
+                f":black_small_square: {total_failed} failed\n"
+                f"{count_note}"
+                f"Please check logs for more information."
+            )
+            slack_notify_webhook(message, 'fail', SLACK_WEBHOOK_URL)
     elif outcome == 'fail':
         message = f"Automated parsing of workbooks failed.\n Please check error logs. \n"
         slack_notify_webhook(message, 'fail', SLACK_WEBHOOK_URL)
@@ -278,9 +434,16 @@ def main():
     Main function to run the script.
     """
     parsed_args = parse_args()
+    if parsed_args.run_id:
+        log.info(f"Run ID: {parsed_args.run_id}")
+    tracer.configure(
+        parsed_args.run_id, parsed_args.trace_file,
+        service_name="slack_notifications"
+    )
     if parsed_args.channel == 'egg-test':
         log.info("Running in testing mode")
-    coordinate_notifications(parsed_args, parsed_args.outcome)
+    with tracer.span('slack_notifications', outcome=parsed_args.outcome):
+        coordinate_notifications(parsed_args, parsed_args.outcome)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,432 @@
+"""
+Run-level tracing for automated clinvar submission.
+
+Each stage of a run (nextflow process, workbook parser, slack notifier)
+appends timed spans to a per-run JSON lines file using OpenTelemetry span
+fields, all sharing a trace id derived from the run id generated in
+main.nf. The report subcommand turns a run's spans into a critical-path
+breakdown.
+"""
+from contextlib import contextmanager
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+RUN_ID_ENV = 'AUTO_CLINVAR_RUN_ID'
+TRACE_FILE_ENV = 'AUTO_CLINVAR_TRACE_FILE'
+PARENT_SPAN_ENV = 'AUTO_CLINVAR_PARENT_SPAN_ID'
+SPAN_KEYS = ('traceId', 'spanId', 'startTimeUnixNano', 'endTimeUnixNano')
+
+log = logging.getLogger("tracing")
+
+
+def trace_id_from_run_id(run_id):
+    """
+    Derive a 32 hex character OpenTelemetry trace id from a run id.
+
+    Parameters
+    ----------
+    run_id : str
+        The run id generated in main.nf.
+
+    Returns
+    -------
+    str
+        The trace id shared by every span of the run.
+    """
+    try:
+        return uuid.UUID(run_id).hex
+    except ValueError:
+        return uuid.uuid5(uuid.NAMESPACE_URL, run_id).hex
+
+
+def new_span_id():
+    """
+    Generate a new 16 hex character OpenTelemetry span id.
+
+    Returns
+    -------
+    str
+        Random span id.
+    """
+    return os.urandom(8).hex()
+
+
+class Tracer:
+    """
+    Writes spans for a single run to a JSON lines trace file. Does nothing
+    if no run id or trace file is configured.
+    """
+
+    def __init__(self, run_id=None, trace_file=None, service_name=None,
+                 parent_span_id=None):
+        self.configure(run_id, trace_file, service_name, parent_span_id)
+
+    def configure(self, run_id=None, trace_file=None, service_name=None,
+                  parent_span_id=None):
+        """
+        Set the run the tracer records spans for.
+
+        Parameters
+        ----------
+        run_id : str, optional
+            The run id generated in main.nf.
+        trace_file : str, optional
+            Path to the JSON lines trace file spans are appended to.
+        service_name : str, optional
+            Name of the stage recording spans.
+        parent_span_id : str, optional
+            Span id of the calling stage, used as parent of top level spans.
+        """
+        self.run_id = run_id
+        self.trace_file = trace_file
+        self.service_name = service_name
+        self._span_stack = [parent_span_id] if parent_span_id else []
+
+    @property
+    def enabled(self):
+        return bool(self.run_id and self.trace_file)
+
+    def record_span(self, name, start_ns, end_ns, span_id=None,
+                    parent_span_id=None, attributes=None, error=False):
+        """
+        Append a completed span to the trace file. Failing to write the
+        span is logged and otherwise ignored so tracing never changes the
+        outcome of a run.
+
+        Parameters
+        ----------
+        name : str
+            Name of the span.
+        start_ns : int
+            Start time in nanoseconds since the epoch.
+        end_ns : int
+            End time in nanoseconds since the epoch.
+        span_id : str, optional
+            Span id, generated if not given.
+        parent_span_id : str, optional
+            Span id of the parent span.
+        attributes : dict, optional
+            Extra attributes to record on the span.
+        error : bool, optional
+            Whether the span ended in error, by default False.
+        """
+        if not self.enabled:
+            return
+        attributes = dict(attributes or {})
+        attributes['run.id'] = self.run_id
+        if self.service_name:
+            attributes['service.name'] = self.service_name
+        span = {
+            'traceId': trace_id_from_run_id(self.run_id),
+            'spanId': span_id or new_span_id(),
+            'parentSpanId': parent_span_id or '',
+            'name': name,
+            'startTimeUnixNano': start_ns,
+            'endTimeUnixNano': end_ns,
+            'attributes': [
+                {'key': key, 'value': {'stringValue': str(value)}}
+                for key, value in attributes.items()
+            ],
+            'status': {
+                'code': 'STATUS_CODE_ERROR' if error else 'STATUS_CODE_OK'
+            },
+        }
+        try:
+            trace_dir = os.path.dirname(self.trace_file)
+            if trace_dir:
+                os.makedirs(trace_dir, exist_ok=True)
+            with open(self.trace_file, 'a') as file:
+                file.write(json.dumps(span) + '\n')
+        except OSError as err:
+            log.warning(f"Failed to write span {name} to trace file: {err}")
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Time the enclosed block as a span, nested under any enclosing span.
+        Yields the attribute dict so the caller can add to it.
+
+        Parameters
+        ----------
+        name : str
+            Name of the span.
+        **attributes
+            Attributes to record on the span.
+        """
+        span_id = new_span_id()
+        parent_span_id = self._span_stack[-1] if self._span_stack else None
+        self._span_stack.append(span_id)
+        start_ns = time.time_ns()
+        error = False
+        try:
+            yield attributes
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self._span_stack.pop()
+            self.record_span(
+                name, start_ns, time.time_ns(), span_id=span_id,
+                parent_span_id=parent_span_id, attributes=attributes,
+                error=error
+            )
+
+
+def read_spans(trace_file, run_id=None):
+    """
+    Read the spans for one run from a trace file, skipping malformed
+    lines such as one cut short when a stage was killed mid-write, and
+    records that are not spans.
+
+    Parameters
+    ----------
+    trace_file : str
+        Path to the JSON lines trace file.
+    run_id : str, optional
+        Run to read spans for. Defaults to the most recently started run.
+
+    Returns
+    -------
+    list
+        Spans of the run as dicts.
+    """
+    spans = []
+    with open(trace_file, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                span = json.loads(line)
+            except json.JSONDecodeError:
+                span = None
+            if not isinstance(span, dict) or any(
+                    key not in span for key in SPAN_KEYS):
+                log.warning(f"Skipping malformed span line: {line}")
+                continue
+            spans.append(span)
+    if not spans:
+        return []
+    if run_id is None:
+        trace_id = max(spans, key=lambda s: s['startTimeUnixNano'])['traceId']
+    else:
+        trace_id = trace_id_from_run_id(run_id)
+    return [span for span in spans if span['traceId'] == trace_id]
+
+
+def critical_path(spans):
+    """
+    Compute the critical path through a run's spans.
+
+    Starting from the span that finishes last, walk backwards in time
+    taking at each step the span that finished last before the current
+    one started, then descend into each chosen span's children the same
+    way. The self time of a span is its duration not covered by children
+    on the path.
+
+    Parameters
+    ----------
+    spans : list
+        Spans of a single run, as returned by read_spans.
+
+    Returns
+    -------
+    list
+        (depth, span, self_time_ns) tuples in start order.
+    """
+    span_ids = {span['spanId'] for span in spans}
+    children = {}
+    for span in spans:
+        parent = span.get('parentSpanId')
+        parent = parent if parent in span_ids else ''
+        children.setdefault(parent, []).append(span)
+
+    def walk(candidates, cursor):
+        chain = []
+        candidates = sorted(
+            candidates, key=lambda s: s['endTimeUnixNano'], reverse=True
+        )
+        for span in candidates:
+            if span['endTimeUnixNano'] <= cursor:
+                chain.append(span)
+                cursor = span['startTimeUnixNano']
+        return list(reversed(chain))
+
+    def expand(span, depth):
+        path_children = walk(
+            children.get(span['spanId'], []), span['endTimeUnixNano']
+        )
+        duration = span['endTimeUnixNano'] - span['startTimeUnixNano']
+        covered = sum(
+            child['endTimeUnixNano'] - child['startTimeUnixNano']
+            for child in path_children
+        )
+        rows = [(depth, span, max(duration - covered, 0))]
+        for child in path_children:
+            rows.extend(expand(child, depth + 1))
+        return rows
+
+    rows = []
+    for span in walk(children.get('', []), float('inf')):
+        rows.extend(expand(span, 0))
+    return rows
+
+
+def format_report(spans):
+    """
+    Format a critical-path breakdown of a run's spans.
+
+    Parameters
+    ----------
+    spans : list
+        Spans of a single run, as returned by read_spans.
+
+    Returns
+    -------
+    str
+        Human readable report.
+    """
+    if not spans:
+        return "No spans found"
+    run_start = min(span['startTimeUnixNano'] for span in spans)
+    run_end = max(span['endTimeUnixNano'] for span in spans)
+    wall_ns = max(run_end - run_start, 1)
+    run_ids = {
+        attr['value']['stringValue'] for attr in spans[0]['attributes']
+        if attr['key'] == 'run.id'
+    }
+    lines = [
+        f"Run {', '.join(run_ids) or spans[0]['traceId']}: "
+        f"{wall_ns / 1e9:.2f}s wall time",
+        f"{'span':<40} {'duration':>10} {'self':>10} {'% run':>7}",
+    ]
+    for depth, span, self_ns in critical_path(spans):
+        duration_ns = span['endTimeUnixNano'] - span['startTimeUnixNano']
+        name = '  ' * depth + span['name']
+        if span['status']['code'] == 'STATUS_CODE_ERROR':
+            name += ' (error)'
+        lines.append(
+            f"{name:<40} {duration_ns / 1e9:>9.2f}s {self_ns / 1e9:>9.2f}s "
+            f"{100 * self_ns / wall_ns:>6.1f}%"
+        )
+    return '\n'.join(lines)
+
+
+def run_command(args):
+    """
+    Run a command as a traced span and return its exit code. The span id
+    is exported to the command so any spans it writes nest beneath it.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed arguments of the run subcommand.
+
+    Returns
+    -------
+    int
+        Exit code of the command.
+    """
+    tracer = Tracer(args.run_id, args.trace_file, args.name)
+    span_id = new_span_id()
+    env = dict(os.environ)
+    if tracer.enabled:
+        env.update({
+            RUN_ID_ENV: args.run_id,
+            TRACE_FILE_ENV: args.trace_file,
+            PARENT_SPAN_ENV: span_id,
+        })
+    attributes = dict(
+        attribute.split('=', 1) for attribute in args.attribute or []
+    )
+    start_ns = time.time_ns()
+    returncode = subprocess.call(args.command, env=env)
+    attributes['process.exit_code'] = returncode
+    tracer.record_span(
+        args.name, start_ns, time.time_ns(), span_id=span_id,
+        attributes=attributes, error=returncode != 0
+    )
+    return returncode
+
+
+def parse_args():
+    """
+    Parse arguments passed to the script
+
+    Returns
+    -------
+    argparse.Namespace
+        parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Run-level tracing for automated clinvar submission"
+    )
+    subparsers = parser.add_subparsers(dest='subcommand', required=True)
+
+    run_parser = subparsers.add_parser(
+        'run', help="run a command, recording it as a span"
+    )
+    run_parser.add_argument(
+        '--name', help="name of the span", type=str, required=True
+    )
+    run_parser.add_argument(
+        '--run-id', help="run id generated in main.nf", type=str,
+        required=True
+    )
+    run_parser.add_argument(
+        '--trace-file', help="path to trace file", type=str, required=True
+    )
+    run_parser.add_argument(
+        '--attribute', help="KEY=VALUE attribute to record on the span, "
+        "may be repeated", type=str, action='append', default=[]
+    )
+    run_parser.add_argument(
+        'command', nargs=argparse.REMAINDER,
+        help="command to run, after --"
+    )
+
+    report_parser = subparsers.add_parser(
+        'report', help="print critical-path breakdown of a run"
+    )
+    report_parser.add_argument(
+        '--trace-file', help="path to trace file", type=str, required=True
+    )
+    report_parser.add_argument(
+        '--run-id', help="run to report on, defaults to the latest run",
+        type=str, required=False, default=None
+    )
+
+    args = parser.parse_args()
+    if args.subcommand == 'run':
+        if args.command[:1] == ['--']:
+            args.command = args.command[1:]
+        if not args.command:
+            parser.error("no command given to run")
+        if any('=' not in attribute for attribute in args.attribute):
+            parser.error("attributes must be given as KEY=VALUE")
+    return args
+
+
+def main():
+    """
+    Main function to run the script.
+    """
+    args = parse_args()
+    if args.subcommand == 'run':
+        sys.exit(run_command(args))
+    try:
+        spans = read_spans(args.trace_file, args.run_id)
+    except OSError as err:
+        print(f"Error: unable to read trace file: {err}", file=sys.stderr)
+        sys.exit(1)
+    print(format_report(spans))
+
+
+if __name__ == "__main__":
+    main()